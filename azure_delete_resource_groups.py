@@ -3,7 +3,7 @@
 """
 Script para deletar grupos de recursos com opção de exclusão por nome
 Requer: Azure CLI instalado e autenticado (az login já realizado)
-Execução: Paralela para melhor performance
+Execução: Paralela para melhor performance, via API REST do Azure Resource Manager
 Suporta: Filtros de exclusão por padrão, confirmação antes de deletar
 """
 import subprocess
@@ -12,36 +12,252 @@ import json
 import shutil
 import os
 import re
-from typing import List, Dict, Set
+import time
+import logging
+import logging.handlers
+import queue
+import threading
+import uuid
+import ssl
+import base64
+import http.client
+import urllib.request
+from datetime import datetime
+from urllib.parse import quote, unquote, urlsplit
+from typing import List, Dict, Set, Optional
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# orjson é opcional: quando instalado, acelera o parse das respostas do ARM
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+ARM_POOL_SIZE = 32
+SUBSCRIPTIONS_API_VERSION = "2020-01-01"
+RESOURCE_GROUPS_API_VERSION = "2021-04-01"
+RESOURCE_GRAPH_API_VERSION = "2021-03-01"
+RESOURCE_GRAPH_PAGE_SIZE = 1000
+RESOURCE_GRAPH_MAX_SUBSCRIPTIONS = 1000
+RESOURCE_GROUPS_QUERY = (
+    "ResourceContainers"
+    " | where type == 'microsoft.resources/subscriptions/resourcegroups'"
+    " | project name, subscriptionId, id"
+)
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+BATCH_API_VERSION = "2020-06-01"
+DELETE_BATCH_SIZE = 20
+ASYNC_OPERATION_TIMEOUT_SECONDS = 300
+THROTTLE_MAX_RETRIES = 3
+YES_ANSWERS = frozenset({'s', 'sim', 'y', 'yes'})
+NO_ANSWERS = frozenset({'n', 'nao', 'não', 'no'})
+LOGGER_NAME = "azdelete"
+LOG_BUFFER_CAPACITY = 256
+CACHE_FILE = os.path.join(".cache", "azure-context-cache.json")
+CACHE_TTL_SECONDS = 600
+CACHE_VERSION = 1
+CACHE_GROUP_KEYS = ('name', 'subscription', 'id', 'subscription_id')
+
+
+def get_logger() -> logging.Logger:
+    """Configura (uma única vez) o logger do script
+
+    Mensagens abaixo de ERROR passam por um MemoryHandler e são escritas no
+    stdout em blocos; erros vão direto para o stderr.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        buffered_handler = logging.handlers.MemoryHandler(
+            LOG_BUFFER_CAPACITY,
+            target=logging.StreamHandler(sys.stdout)
+        )
+        buffered_handler.addFilter(lambda record: record.levelno < logging.ERROR)
+        error_handler = logging.StreamHandler(sys.stderr)
+        error_handler.setLevel(logging.ERROR)
+
+        logger.addHandler(buffered_handler)
+        logger.addHandler(error_handler)
+    return logger
+
+
+def relative_path(url: str) -> str:
+    """Converte uma URL absoluta do ARM (nextLink, Location) em caminho relativo"""
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+def retry_after_seconds(headers, default: int = 1) -> int:
+    """Lê o cabeçalho Retry-After (em segundos) de uma resposta do ARM"""
+    value = str(headers.get("Retry-After") or "")
+    return int(value) if value.isdigit() else default
+
+
+class ArmClient:
+    """Cliente HTTPS mínimo para a API REST do Azure Resource Manager
+
+    Mantém um pool de conexões keep-alive reutilizadas entre as chamadas e
+    guarda o token de acesso até próximo da expiração. Assim como o Azure
+    CLI, respeita HTTPS_PROXY/NO_PROXY e REQUESTS_CA_BUNDLE.
+    """
+
+    def __init__(self, endpoint: str, token_provider, pool_size: int = ARM_POOL_SIZE,
+                 timeout: int = 60):
+        parts = urlsplit(endpoint)
+        self.host = parts.hostname
+        self.port = parts.port or 443
+        self.token_provider = token_provider
+        self.timeout = timeout
+        self.ssl_context = ssl.create_default_context(
+            cafile=os.environ.get("REQUESTS_CA_BUNDLE") or None
+        )
+        self.proxy = None
+        self.proxy_headers = {}
+
+        proxy = urllib.request.getproxies().get("https")
+        if proxy and not urllib.request.proxy_bypass(self.host):
+            proxy_url = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+            if proxy_url.scheme != "http" or not proxy_url.hostname:
+                raise ValueError(f"Proxy não suportado (use http://host:porta): {proxy}")
+            self.proxy = (proxy_url.hostname, proxy_url.port or 80)
+            if proxy_url.username:
+                credentials = f"{unquote(proxy_url.username)}:{unquote(proxy_url.password or '')}"
+                self.proxy_headers["Proxy-Authorization"] = (
+                    f"Basic {base64.b64encode(credentials.encode('utf-8')).decode('ascii')}"
+                )
+
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._token = None
+        self._token_expires_on = 0.0
+        self._token_lock = threading.Lock()
+
+    def get_token(self) -> str:
+        """Retorna o token em cache, renovando-o se estiver perto de expirar"""
+        with self._token_lock:
+            if time.time() >= self._token_expires_on - TOKEN_REFRESH_MARGIN_SECONDS:
+                self._token, self._token_expires_on = self.token_provider()
+            return self._token
+
+    def _new_connection(self) -> http.client.HTTPSConnection:
+        if self.proxy is None:
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout, context=self.ssl_context
+            )
+
+        # Conecta ao proxy e abre um túnel (CONNECT) até o ARM
+        connection = http.client.HTTPSConnection(
+            *self.proxy, timeout=self.timeout, context=self.ssl_context
+        )
+        connection.set_tunnel(self.host, self.port, headers=self.proxy_headers)
+        return connection
+
+    def _acquire_connection(self) -> tuple:
+        """Retorna (conexão, reaproveitada do pool)"""
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release_connection(self, connection: http.client.HTTPSConnection) -> None:
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _discard_idle_connections(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _send(self, connection: http.client.HTTPSConnection, method: str, path: str,
+              body: bytes, headers: Dict) -> tuple:
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except BaseException:
+            connection.close()
+            raise
+        self._release_connection(connection)
+        return response.status, data, response.headers
+
+    def request(self, method: str, path: str, body: bytes = None) -> tuple:
+        """Executa uma requisição e retorna (status, corpo em bytes, cabeçalhos)"""
+        # O id da requisição é devolvido pelo ARM e permite rastrear falhas
+        headers = {
+            "Authorization": f"Bearer {self.get_token()}",
+            "Accept": "application/json",
+            "Connection": "keep-alive",
+            "x-ms-client-request-id": str(uuid.uuid4()),
+            "x-ms-return-client-request-id": "true",
+        }
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+
+        connection, reused = self._acquire_connection()
+        try:
+            return self._send(connection, method, path, body, headers)
+        except (ConnectionResetError, ConnectionAbortedError, BrokenPipeError):
+            # Uma conexão ociosa no pool foi fechada pelo servidor antes de
+            # responder (http.client.RemoteDisconnected é um ConnectionResetError).
+            # As demais provavelmente também expiraram: descarta todas e tenta
+            # uma única vez numa conexão nova. Timeouts nunca são repetidos.
+            if not reused:
+                raise
+            self._discard_idle_connections()
+            return self._send(self._new_connection(), method, path, body, headers)
+
+
 class AzureResourceGroupDeleter:
-    def __init__(self, verbose: bool = True, max_workers: int = 5, dry_run: bool = False):
+    def __init__(self, verbose: bool = True, max_workers: int = 5, dry_run: bool = False,
+                 clear_cache: bool = False):
         self.verbose = verbose
         self.max_workers = max_workers
         self.dry_run = dry_run
+        self.clear_cache = clear_cache
+        self.logger = get_logger()
+        self.executor = None
+        self.tenant_id = None
         self.az_command = self.find_az_command()
+        self.arm_endpoint = None
+        self.arm = None
         self.groups_to_delete = []
         self.groups_to_keep = []
+        self.exclude_exact = frozenset()
+        self.exclude_regexes = []
         self.deleted_groups = []
         self.failed_groups = []
+        self.unconfirmed_groups = []
 
     def log(self, message: str):
         """Exibe mensagens de log se verbose estiver ativado"""
         if self.verbose:
-            print(f"[INFO] {message}")
+            self.logger.info(f"[INFO] {message}")
 
     def log_error(self, message: str):
         """Exibe mensagens de erro"""
-        print(f"[ERRO] {message}", file=sys.stderr)
+        # Esvazia o buffer antes para manter a ordem entre stdout e stderr
+        self.flush_logs()
+        self.logger.error(f"[ERRO] {message}")
 
     def log_success(self, message: str):
         """Exibe mensagens de sucesso"""
-        print(f"[✓] {message}")
+        self.logger.info(f"[✓] {message}")
 
     def log_warning(self, message: str):
         """Exibe mensagens de aviso"""
-        print(f"[⚠] {message}")
+        self.logger.warning(f"[⚠] {message}")
+
+    def flush_logs(self):
+        """Escreve as mensagens de log pendentes no buffer"""
+        for handler in self.logger.handlers:
+            handler.flush()
 
     def format_group_name(self, group_info: Dict) -> str:
         """Formata o nome do grupo com prefixo da assinatura"""
@@ -68,17 +284,35 @@ class AzureResourceGroupDeleter:
 
         return "az"
 
+    def get_executor(self) -> ThreadPoolExecutor:
+        """Retorna o pool de threads compartilhado entre listagem e deleção"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    def shutdown_executor(self) -> None:
+        """Encerra o pool de threads compartilhado, se tiver sido criado"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
     def run_command(self, command: List[str], capture_output: bool = True) -> tuple:
-        """Executa um comando e retorna (returncode, stdout, stderr)"""
+        """Executa um comando e retorna (returncode, stdout, stderr)
+
+        O comando é executado diretamente, sem shell: no Windows o caminho
+        completo do az.cmd já é resolvido por find_az_command.
+        """
         try:
             result = subprocess.run(
                 command,
                 capture_output=capture_output,
                 text=True,
-                check=False,
-                shell=sys.platform == "win32"
+                check=False
             )
             return result.returncode, result.stdout, result.stderr
+        except FileNotFoundError as e:
+            # Mesmo código usado pelos shells para "comando não encontrado"
+            return 127, "", str(e)
         except Exception as e:
             self.log_error(f"Erro ao executar comando: {str(e)}")
             return 1, "", str(e)
@@ -88,124 +322,394 @@ class AzureResourceGroupDeleter:
         self.log("Verificando Azure CLI...")
         self.log(f"Usando comando: {self.az_command}")
 
-        returncode, stdout, stderr = self.run_command([self.az_command, "version"])
-        if returncode != 0:
+        # Não exige login: verifica a instalação e obtém o endpoint da nuvem
+        # configurada no Azure CLI (az cloud set)
+        returncode, stdout, stderr = self.run_command(
+            [self.az_command, "cloud", "show",
+             "--query", "endpoints.resourceManager", "--output", "tsv"]
+        )
+        if returncode == 127:
             self.log_error("Azure CLI não está instalado ou não está acessível")
             return False
 
         self.log("✓ Azure CLI encontrado")
 
-        # Verifica se está autenticado
-        returncode, stdout, stderr = self.run_command([self.az_command, "account", "show"])
-        if returncode != 0:
+        if returncode != 0 or not stdout.strip():
+            self.log_error(f"Erro ao obter o endpoint do Azure Resource Manager: {stderr}")
+            return False
+
+        self.arm_endpoint = stdout.strip()
+        try:
+            self.arm = ArmClient(self.arm_endpoint, self.get_access_token)
+        except ValueError as e:
+            self.log_error(str(e))
+            return False
+
+        # Obter o token já comprova o login, informa o tenant e preenche o
+        # cache de token do cliente ARM
+        try:
+            self.arm.get_token()
+        except (RuntimeError, KeyError, ValueError):
             self.log_error("Não autenticado na Azure. Execute: az login")
             return False
 
         self.log("✓ Autenticado na Azure")
+        self.log(f"Usando Azure Resource Manager: {self.arm_endpoint}")
+        self.flush_logs()
         return True
 
-    def get_all_subscriptions(self) -> List[Dict]:
-        """Lista todas as assinaturas"""
-        self.log("Obtendo todas as assinaturas...")
-
+    def get_access_token(self) -> tuple:
+        """Obtém um token de acesso ao ARM a partir da sessão do Azure CLI"""
         returncode, stdout, stderr = self.run_command(
-            [self.az_command, "account", "list", "--output", "json"]
+            [self.az_command, "account", "get-access-token",
+             "--resource", self.arm_endpoint,
+             "--query", "{accessToken:accessToken,expiresOn:expiresOn,expires_on:expires_on,tenant:tenant}",
+             "--output", "json"]
         )
-
         if returncode != 0:
-            self.log_error(f"Erro ao listar assinaturas: {stderr}")
-            return []
+            raise RuntimeError(f"Erro ao obter token de acesso: {stderr}")
 
         try:
-            subscriptions = json.loads(stdout)
-            self.log(f"Encontradas {len(subscriptions)} assinatura(s)")
-            return subscriptions
+            token = json_loads(stdout)
         except json.JSONDecodeError:
-            self.log_error("Erro ao processar resposta JSON das assinaturas")
-            return []
+            raise RuntimeError("Resposta inválida do Azure CLI ao obter token de acesso")
+
+        self.tenant_id = token.get("tenant") or self.tenant_id
+
+        expires_on = token.get("expires_on")
+        if expires_on is None:
+            # Versões antigas do Azure CLI só informam a data em horário local
+            expires_on = datetime.strptime(
+                token["expiresOn"], "%Y-%m-%d %H:%M:%S.%f"
+            ).timestamp()
+        return token["accessToken"], float(expires_on)
+
+    def arm_send(self, method: str, path: str, body: bytes = None) -> tuple:
+        """Envia uma requisição ARM, repetindo-a após o Retry-After se receber HTTP 429"""
+        status, data, headers = self.arm.request(method, path, body)
+        for _ in range(THROTTLE_MAX_RETRIES):
+            if status != 429:
+                break
+            time.sleep(retry_after_seconds(headers))
+            status, data, headers = self.arm.request(method, path, body)
+        return status, data, headers
+
+    def arm_request(self, method: str, path: str, body: bytes = None, wait: bool = False) -> tuple:
+        """Executa uma requisição ARM e retorna (status, payload, erro)
+
+        Com wait=True, respostas 202 com cabeçalho Location são acompanhadas
+        até a operação assíncrona terminar. Se o acompanhamento falhar ou
+        passar de ASYNC_OPERATION_TIMEOUT_SECONDS, retorna 202 sem payload:
+        a operação foi aceita, mas o resultado é desconhecido.
+        """
+        try:
+            status, data, headers = self.arm_send(method, path, body)
+        except Exception as e:
+            return 0, None, str(e)
 
-    def get_resource_groups_in_subscription(self, subscription_id: str) -> List[Dict]:
-        """Lista grupos de recursos de uma assinatura específica"""
-        returncode, stdout, stderr = self.run_command(
-            [self.az_command, "group", "list", "--subscription", subscription_id, "--output", "json"]
+        if wait and status == 202 and headers.get("Location"):
+            deadline = time.monotonic() + ASYNC_OPERATION_TIMEOUT_SECONDS
+            try:
+                while status == 202 and headers.get("Location"):
+                    if time.monotonic() >= deadline:
+                        return 202, None, (
+                            f"Operação assíncrona não concluída em {ASYNC_OPERATION_TIMEOUT_SECONDS}s"
+                        )
+                    time.sleep(retry_after_seconds(headers))
+                    status, data, headers = self.arm_send("GET", relative_path(headers["Location"]))
+            except Exception as e:
+                return 202, None, f"Erro ao acompanhar a operação assíncrona: {str(e)}"
+
+            if status >= 400:
+                return 202, None, f"Erro ao acompanhar a operação assíncrona: HTTP {status}"
+
+        payload = None
+        if data:
+            try:
+                payload = json_loads(data)
+            except json.JSONDecodeError:
+                return status, None, "Resposta JSON inválida"
+
+        error = ""
+        if status >= 400:
+            error = f"HTTP {status}"
+            if isinstance(payload, dict) and isinstance(payload.get("error"), dict):
+                error = f"{error}: {payload['error'].get('message', '')}"
+            request_id = headers.get("x-ms-client-request-id")
+            if request_id:
+                error = f"{error} (request id: {request_id})"
+        return status, payload, error
+
+    def arm_list(self, path: str) -> tuple:
+        """Lista todos os itens de uma coleção ARM seguindo o nextLink"""
+        items = []
+        while path:
+            status, payload, error = self.arm_request("GET", path)
+            if status != 200 or payload is None:
+                return False, items, error or f"HTTP {status}"
+
+            items.extend(payload.get("value", []))
+            next_link = payload.get("nextLink")
+            path = relative_path(next_link) if next_link else None
+        return True, items, ""
+
+    def get_all_subscriptions(self) -> List[Dict]:
+        """Lista todas as assinaturas"""
+        self.log("Obtendo todas as assinaturas...")
+
+        ok, items, error = self.arm_list(
+            f"/subscriptions?api-version={SUBSCRIPTIONS_API_VERSION}"
         )
 
-        if returncode != 0:
-            self.log_error(f"Erro ao listar grupos da assinatura {subscription_id}: {stderr}")
+        if not ok:
+            self.log_error(f"Erro ao listar assinaturas: {error}")
             return []
 
-        try:
-            groups = json.loads(stdout)
-            return groups
-        except json.JSONDecodeError:
-            self.log_error(f"Erro ao processar grupos da assinatura {subscription_id}")
-            return []
+        subscriptions = [
+            {'id': item['subscriptionId'], 'name': item.get('displayName', 'Unknown')}
+            for item in items
+        ]
+        self.log(f"Encontradas {len(subscriptions)} assinatura(s)")
+        return subscriptions
+
+    def get_resource_groups_in_subscription(self, subscription_id: str) -> Optional[List[Dict]]:
+        """Lista grupos de recursos de uma assinatura específica (None em caso de erro)"""
+        ok, groups, error = self.arm_list(
+            f"/subscriptions/{subscription_id}/resourcegroups"
+            f"?api-version={RESOURCE_GROUPS_API_VERSION}"
+        )
 
-    def should_exclude_group(self, group_name: str, exclude_patterns: List[str]) -> bool:
-        """Verifica se o grupo deve ser excluído baseado nos padrões"""
-        for pattern in exclude_patterns:
+        if not ok:
+            self.log_error(f"Erro ao listar grupos da assinatura {subscription_id}: {error}")
+            return None
+
+        return groups
+
+    def get_resource_groups_from_graph(self, subscription_ids: List[str]) -> Optional[List[Dict]]:
+        """Lista os grupos de todas as assinaturas com uma consulta ao Resource Graph
+
+        Retorna None se a consulta falhar, para que a listagem por assinatura
+        seja usada no lugar.
+        """
+        groups = []
+        for start in range(0, len(subscription_ids), RESOURCE_GRAPH_MAX_SUBSCRIPTIONS):
+            request = {
+                "subscriptions": subscription_ids[start:start + RESOURCE_GRAPH_MAX_SUBSCRIPTIONS],
+                "query": RESOURCE_GROUPS_QUERY,
+                "options": {"$top": RESOURCE_GRAPH_PAGE_SIZE},
+            }
+            while True:
+                status, payload, error = self.arm_request(
+                    "POST",
+                    f"/providers/Microsoft.ResourceGraph/resources"
+                    f"?api-version={RESOURCE_GRAPH_API_VERSION}",
+                    json.dumps(request).encode("utf-8")
+                )
+                if status != 200 or payload is None:
+                    self.log_warning(f"Erro ao consultar o Resource Graph: {error or f'HTTP {status}'}")
+                    return None
+
+                groups.extend(payload.get("data", []))
+                skip_token = payload.get("$skipToken")
+                if not skip_token:
+                    break
+                request["options"]["$skipToken"] = skip_token
+
+        return groups
+
+    def get_resource_groups_per_subscription(self, subscriptions: List[Dict]) -> tuple:
+        """Lista os grupos de cada assinatura em paralelo (sobrepõe a latência de rede)
+
+        Retorna (grupos, completo); completo é False se alguma assinatura falhou.
+        """
+        all_groups = []
+        complete = True
+        executor = self.get_executor()
+        futures = {}
+        for subscription in subscriptions:
+            self.log(f"Listando grupos da assinatura: {subscription.get('name', 'Unknown')}")
+            future = executor.submit(self.get_resource_groups_in_subscription, subscription['id'])
+            futures[future] = subscription
+
+        for future in as_completed(futures):
+            subscription = futures[future]
+            sub_id = subscription['id']
+            sub_name = subscription.get('name', 'Unknown')
             try:
-                # Tenta primeiro uma correspondência exata (case-insensitive)
-                if group_name.lower() == pattern.lower():
-                    return True
-                # Depois tenta como regex
-                if re.search(pattern, group_name, re.IGNORECASE):
-                    return True
+                groups = future.result()
+            except Exception as e:
+                self.log_error(f"Exceção ao listar grupos da assinatura {sub_name}: {str(e)}")
+                groups = None
+
+            if groups is None:
+                complete = False
+                continue
+
+            all_groups.extend(
+                {
+                    'name': group['name'],
+                    'subscription': sub_name,
+                    'id': group['id'],
+                    'subscription_id': sub_id
+                }
+                for group in groups
+            )
+
+        return all_groups, complete
+
+    def compile_exclude_patterns(self, exclude_patterns: List[str]) -> None:
+        """Pré-compila os padrões de exclusão uma única vez
+
+        Padrões regex inválidos geram um único aviso e valem apenas como
+        nome exato, sem custo extra na classificação dos grupos.
+        """
+        self.exclude_exact = frozenset(pattern.casefold() for pattern in exclude_patterns)
+        self.exclude_regexes = []
+        for pattern in dict.fromkeys(exclude_patterns):
+            try:
+                self.exclude_regexes.append(re.compile(pattern, re.IGNORECASE))
             except re.error:
                 self.log_warning(f"Padrão regex inválido: {pattern}")
-                continue
-        return False
 
-    def collect_groups(self, exclude_patterns: List[str]) -> bool:
-        """Coleta todos os grupos de recursos de todas as assinaturas"""
-        if not self.check_azure_cli():
-            return False
+    def should_exclude_group(self, group_name: str) -> bool:
+        """Verifica se o grupo deve ser excluído baseado nos padrões"""
+        # Tenta primeiro uma correspondência exata (case-insensitive)
+        if group_name.casefold() in self.exclude_exact:
+            return True
+        # Depois tenta como regex
+        return any(regex.search(group_name) for regex in self.exclude_regexes)
+
+    def load_cache(self) -> Optional[List[Dict]]:
+        """Carrega a listagem de grupos do cache em disco, se ainda estiver válida"""
+        if self.clear_cache or not os.path.exists(CACHE_FILE):
+            return None
+
+        age = time.time() - os.path.getmtime(CACHE_FILE)
+        if age > CACHE_TTL_SECONDS:
+            return None
+
+        try:
+            with open(CACHE_FILE, "rb") as cache_file:
+                cache = json_loads(cache_file.read())
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        # Um cache de outro formato ou gerado em outro tenant nunca deve ser reaproveitado
+        if not isinstance(cache, dict):
+            return None
+        if cache.get('version') != CACHE_VERSION or cache.get('tenant_id') != self.tenant_id:
+            return None
+
+        groups = cache.get('groups')
+        if not isinstance(groups, list) or not all(
+            isinstance(group, dict)
+            and all(isinstance(group.get(key), str) for key in CACHE_GROUP_KEYS)
+            for group in groups
+        ):
+            return None
+
+        self.log(f"Usando listagem em cache de {int(age)}s atrás ({CACHE_FILE})")
+        return groups
+
+    def save_cache(self, all_groups: List[Dict]) -> None:
+        """Grava a listagem de grupos no cache em disco"""
+        try:
+            os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+            temp_file = f"{CACHE_FILE}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as cache_file:
+                json.dump(
+                    {'version': CACHE_VERSION, 'tenant_id': self.tenant_id, 'groups': all_groups},
+                    cache_file
+                )
+            os.replace(temp_file, CACHE_FILE)
+        except OSError as e:
+            self.log_warning(f"Não foi possível gravar o cache: {str(e)}")
+
+    def invalidate_cache(self) -> None:
+        """Remove o cache em disco (a listagem deixa de refletir a Azure)"""
+        try:
+            os.remove(CACHE_FILE)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.log_warning(f"Não foi possível remover o cache: {str(e)}")
+
+    def list_all_groups(self) -> tuple:
+        """Lista os grupos de recursos de todas as assinaturas na Azure
 
+        Retorna (grupos, completo); grupos é None se nada pôde ser listado.
+        """
         subscriptions = self.get_all_subscriptions()
 
         if not subscriptions:
             self.log_warning("Nenhuma assinatura encontrada")
-            return False
+            self.flush_logs()
+            return None, False
 
         self.log(f"Processando {len(subscriptions)} assinatura(s)...")
 
-        all_groups = []
-        for subscription in subscriptions:
-            sub_id = subscription['id']
-            sub_name = subscription.get('name', 'Unknown')
-            self.log(f"Listando grupos da assinatura: {sub_name}")
-
-            groups = self.get_resource_groups_in_subscription(sub_id)
-            for group in groups:
-                all_groups.append({
-                    'subscription_id': sub_id,
-                    'subscription_name': sub_name,
-                    'group': group
-                })
-
-        # Classifica em "deletar" e "manter"
-        for item in all_groups:
-            group_name = item['group']['name']
-            sub_name = item['subscription_name']
-
-            group_info = {
-                'name': group_name,
-                'subscription': sub_name,
-                'id': item['group']['id'],
-                'subscription_id': item['subscription_id']
-            }
+        # Uma única consulta ao Resource Graph cobre todas as assinaturas
+        sub_names = {sub['id']: sub.get('name', 'Unknown') for sub in subscriptions}
+        self.log("Consultando grupos no Azure Resource Graph...")
+        self.flush_logs()
+        groups = self.get_resource_groups_from_graph(list(sub_names))
+        if groups is None:
+            self.log("Listando grupos por assinatura...")
+            self.flush_logs()
+            all_groups, complete = self.get_resource_groups_per_subscription(subscriptions)
+        else:
+            all_groups = [
+                {
+                    'name': group['name'],
+                    'subscription': sub_names.get(group['subscriptionId'], 'Unknown'),
+                    'id': group['id'],
+                    'subscription_id': group['subscriptionId']
+                }
+                for group in groups
+            ]
+            complete = True
+
+        self.flush_logs()
+        return all_groups, complete
+
+    def collect_groups(self, exclude_patterns: List[str]) -> bool:
+        """Coleta todos os grupos de recursos de todas as assinaturas"""
+        # Valida os padrões antes de qualquer chamada à Azure
+        self.compile_exclude_patterns(exclude_patterns)
+
+        if not self.check_azure_cli():
+            return False
 
-            if self.should_exclude_group(group_name, exclude_patterns):
+        all_groups = self.load_cache()
+        if all_groups is None:
+            all_groups, complete = self.list_all_groups()
+            if all_groups is None:
+                return False
+            # Uma listagem parcial nunca vai para o cache
+            if complete:
+                self.save_cache(all_groups)
+            else:
+                self.log_warning("Listagem incompleta: o resultado não será gravado no cache")
+
+        # Classifica em "deletar" e "manter" numa única passada
+        for group_info in all_groups:
+            if self.should_exclude_group(group_info['name']):
                 self.groups_to_keep.append(group_info)
             else:
                 self.groups_to_delete.append(group_info)
 
         return True
 
+    def resource_group_path(self, group_info: Dict) -> str:
+        """Monta o caminho ARM de um grupo de recursos"""
+        return (
+            f"/subscriptions/{group_info['subscription_id']}"
+            f"/resourcegroups/{quote(group_info['name'], safe='')}"
+            f"?api-version={RESOURCE_GROUPS_API_VERSION}"
+        )
+
     def delete_resource_group(self, group_info: Dict) -> bool:
         """Deleta um grupo de recursos específico"""
-        group_name = group_info['name']
-        subscription_id = group_info['subscription_id']
         formatted_name = self.format_group_name(group_info)
         
         if self.dry_run:
@@ -214,19 +718,94 @@ class AzureResourceGroupDeleter:
 
         self.log(f"Deletando grupo: {formatted_name}")
 
-        returncode, stdout, stderr = self.run_command(
-            [self.az_command, "group", "delete", 
-             "--name", group_name,
-             "--subscription", subscription_id,
-             "--yes", "--no-wait"]
-        )
+        # O ARM responde 202 e segue a deleção em segundo plano (equivale ao --no-wait)
+        status, payload, error = self.arm_request("DELETE", self.resource_group_path(group_info))
 
-        if returncode != 0:
-            self.log_error(f"Erro ao deletar '{formatted_name}': {stderr}")
+        if status not in (200, 202):
+            self.log_error(f"Erro ao deletar '{formatted_name}': {error}")
             return False
 
         return True
 
+    def delete_resource_group_batch(self, groups: List[Dict]) -> List[Optional[bool]]:
+        """Deleta um lote de grupos com uma única requisição ao endpoint /batch do ARM
+
+        Retorna um resultado por grupo: True (deleção aceita), False (falha) ou
+        None (lote enviado, mas resultado desconhecido).
+        """
+        if self.dry_run or len(groups) == 1:
+            return [self.delete_resource_group(group_info) for group_info in groups]
+
+        for group_info in groups:
+            self.log(f"Deletando grupo: {self.format_group_name(group_info)}")
+
+        results = [False] * len(groups)
+        pending = list(range(len(groups)))
+        for attempt in range(THROTTLE_MAX_RETRIES + 1):
+            requests = [
+                {
+                    "name": str(index),
+                    "httpMethod": "DELETE",
+                    "url": self.resource_group_path(groups[index]),
+                }
+                for index in pending
+            ]
+
+            status, payload, error = self.arm_request(
+                "POST",
+                f"/batch?api-version={BATCH_API_VERSION}",
+                json.dumps({"requests": requests}).encode("utf-8"),
+                wait=True
+            )
+
+            if status >= 400:
+                # O ARM recusou o lote: nenhuma deleção foi iniciada
+                self.log_warning(f"Lote de deleção recusado ({error}), deletando individualmente")
+                for index in pending:
+                    results[index] = self.delete_resource_group(groups[index])
+                return results
+
+            if status != 200 or payload is None:
+                # O lote pode ter sido aceito: reenviar duplicaria as deleções
+                self.log_warning(
+                    f"Lote de deleção sem resultado ({error or f'HTTP {status}'}); "
+                    f"{len(pending)} grupo(s) com resultado desconhecido"
+                )
+                for index in pending:
+                    results[index] = None
+                return results
+
+            responses = {response.get("name"): response for response in payload.get("responses", [])}
+            throttled = []
+            retry_after = 0
+            for index in pending:
+                response = responses.get(str(index), {})
+                sub_status = response.get("httpStatusCode", 0)
+                if sub_status in (200, 202):
+                    results[index] = True
+                elif sub_status == 429 and attempt < THROTTLE_MAX_RETRIES:
+                    # Requisição limitada pela API: tenta de novo após o Retry-After
+                    throttled.append(index)
+                    retry_after = max(retry_after, retry_after_seconds(response.get("headers") or {}))
+                else:
+                    content = response.get("content")
+                    error = f"HTTP {sub_status}"
+                    if isinstance(content, dict) and isinstance(content.get("error"), dict):
+                        error = f"{error}: {content['error'].get('message', '')}"
+                    self.log_error(f"Erro ao deletar '{self.format_group_name(groups[index])}': {error}")
+
+            if not throttled:
+                break
+
+            self.log_warning(
+                f"{len(throttled)} deleção(ões) limitada(s) pela API (HTTP 429), "
+                f"nova tentativa em {retry_after}s"
+            )
+            time.sleep(retry_after)
+            pending = throttled
+
+        return results
+
     def delete_groups_parallel(self) -> None:
         """Deleta grupos em paralelo"""
         if not self.groups_to_delete:
@@ -235,28 +814,43 @@ class AzureResourceGroupDeleter:
 
         self.log(f"Iniciando deleção de {len(self.groups_to_delete)} grupo(s) em paralelo...")
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {
-                executor.submit(self.delete_resource_group, group): 
-                group
-                for group in self.groups_to_delete
-            }
+        # Cada lote vira uma única requisição HTTPS ao endpoint /batch do ARM
+        batches = [
+            self.groups_to_delete[start:start + DELETE_BATCH_SIZE]
+            for start in range(0, len(self.groups_to_delete), DELETE_BATCH_SIZE)
+        ]
+
+        executor = self.get_executor()
+        futures = {
+            executor.submit(self.delete_resource_group_batch, batch):
+            batch
+            for batch in batches
+        }
+
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [False] * len(batch)
+                self.log_error(f"Exceção ao deletar lote de {len(batch)} grupo(s): {str(e)}")
 
-            for future in as_completed(futures):
-                group_info = futures[future]
+            for group_info, deleted in zip(batch, results):
                 formatted_name = self.format_group_name(group_info)
-                try:
-                    if future.result():
-                        self.deleted_groups.append(formatted_name)
-                        self.log_success(f"Deletado com sucesso: {formatted_name}")
-                    else:
-                        self.failed_groups.append(formatted_name)
-                except Exception as e:
+                if deleted is None:
+                    self.unconfirmed_groups.append(formatted_name)
+                elif deleted:
+                    self.deleted_groups.append(formatted_name)
+                    self.log_success(f"Deletado com sucesso: {formatted_name}")
+                else:
                     self.failed_groups.append(formatted_name)
-                    self.log_error(f"Exceção ao deletar '{formatted_name}': {str(e)}")
+
+            # Mostra o progresso a cada lote concluído
+            self.flush_logs()
 
     def display_summary(self) -> None:
         """Exibe um resumo das operações"""
+        self.flush_logs()
         print("")
         print("="*80)
         print("RESUMO DA OPERAÇÃO")
@@ -286,11 +880,31 @@ class AzureResourceGroupDeleter:
                 print(f"   ✗ {formatted_name}")
         print("")
 
+        if self.unconfirmed_groups:
+            print(f"Grupos com deleção enviada, sem confirmação do ARM: {len(self.unconfirmed_groups)}")
+            for formatted_name in self.unconfirmed_groups:
+                print(f"   ? {formatted_name}")
+            print("")
+
         print(f"Grupos identificados para deleção: {len(self.groups_to_delete)}")
         print("="*80)
 
+    def print_groups_by_subscription(self, groups: List[Dict], marker: str) -> None:
+        """Exibe os grupos agrupados por assinatura"""
+        by_subscription = defaultdict(list)
+        for group in groups:
+            by_subscription[group['subscription']].append(group)
+
+        for sub_name in sorted(by_subscription):
+            print(f"Assinatura: {sub_name}")
+            for group in by_subscription[sub_name]:
+                formatted_name = self.format_group_name(group)
+                print(f"   {marker} {formatted_name}")
+            print("")
+
     def display_groups_preview(self) -> None:
         """Exibe uma prévia dos grupos que serão deletados"""
+        self.flush_logs()
         print("")
         print("="*80)
         print("PRÉVIA: GRUPOS PARA DELETAR")
@@ -305,20 +919,7 @@ class AzureResourceGroupDeleter:
         print(f"Total de grupos a deletar: {len(self.groups_to_delete)}")
         print("")
 
-        # Agrupa por assinatura
-        by_subscription = {}
-        for group in self.groups_to_delete:
-            sub = group['subscription']
-            if sub not in by_subscription:
-                by_subscription[sub] = []
-            by_subscription[sub].append(group)
-
-        for sub_name in sorted(by_subscription.keys()):
-            print(f"Assinatura: {sub_name}")
-            for group in by_subscription[sub_name]:
-                formatted_name = self.format_group_name(group)
-                print(f"   • {formatted_name}")
-            print("")
+        self.print_groups_by_subscription(self.groups_to_delete, "•")
 
         print("="*80)
         print("")
@@ -329,25 +930,14 @@ class AzureResourceGroupDeleter:
             print("="*80)
             print("")
 
-            by_subscription = {}
-            for group in self.groups_to_keep:
-                sub = group['subscription']
-                if sub not in by_subscription:
-                    by_subscription[sub] = []
-                by_subscription[sub].append(group)
-
-            for sub_name in sorted(by_subscription.keys()):
-                print(f"Assinatura: {sub_name}")
-                for group in by_subscription[sub_name]:
-                    formatted_name = self.format_group_name(group)
-                    print(f"   ✓ {formatted_name}")
-                print("")
+            self.print_groups_by_subscription(self.groups_to_keep, "✓")
 
 
             print("="*80)
 
     def confirm_deletion(self) -> bool:
         """Solicita confirmação do usuário antes de deletar"""
+        self.flush_logs()
         if self.dry_run:
             print("\n[DRY-RUN] Simulando deleção sem realmente deletar grupos.")
             return True
@@ -364,9 +954,9 @@ class AzureResourceGroupDeleter:
 
         while True:
             response = input("Deseja continuar? (s/n): ").strip().lower()
-            if response in ['s', 'sim', 'y', 'yes']:
+            if response in YES_ANSWERS:
                 return True
-            elif response in ['n', 'nao', 'não', 'no']:
+            elif response in NO_ANSWERS:
                 print("Operação cancelada pelo usuário.")
                 return False
             else:
@@ -374,22 +964,27 @@ class AzureResourceGroupDeleter:
 
     def delete_resource_groups(self, exclude_patterns: List[str]) -> bool:
         """Função principal para deletar grupos de recursos"""
-        # Coleta grupos
-        if not self.collect_groups(exclude_patterns):
-            return False
+        try:
+            # Coleta grupos
+            if not self.collect_groups(exclude_patterns):
+                return False
 
-        # Confirma com usuário
-        if not self.confirm_deletion():
-            return False
+            # Confirma com usuário
+            if not self.confirm_deletion():
+                return False
 
-        # Deleta em paralelo
-        if self.groups_to_delete:
-            self.delete_groups_parallel()
+            # Deleta em paralelo
+            if self.groups_to_delete:
+                self.delete_groups_parallel()
+                if not self.dry_run:
+                    self.invalidate_cache()
 
-        # Exibe resumo
-        self.display_summary()
+            # Exibe resumo
+            self.display_summary()
 
-        return len(self.failed_groups) == 0
+            return len(self.failed_groups) == 0
+        finally:
+            self.shutdown_executor()
 
 
 def main():
@@ -423,16 +1018,23 @@ def main():
         action="store_true",
         help="Modo simulação - lista grupos sem realmente deletar"
     )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help=f"Ignora a listagem em cache (válida por {CACHE_TTL_SECONDS // 60} min) e consulta a Azure novamente"
+    )
 
     args = parser.parse_args()
 
     deleter = AzureResourceGroupDeleter(
         verbose=not args.quiet,
         max_workers=args.workers,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        clear_cache=args.clear_cache
     )
 
     success = deleter.delete_resource_groups(args.exclude)
+    deleter.flush_logs()
 
     sys.exit(0 if success else 1)
 